@@ -1,16 +1,24 @@
 import os
-import json
+import asyncio
+import hashlib
+import hmac
+import logging
+import orjson
 import shutil
 import secrets
+import struct
 import time
-import traceback
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, RedirectResponse
-from typing import Optional, Dict
+from typing import Optional, List, Tuple, TYPE_CHECKING
 from pydantic import BaseModel
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from app.services.credential_utils import get_google_credentials_data, save_credentials_to_token_file
+from app.services.credential_utils import (
+    decode_id_token_payload,
+    get_google_credentials_data,
+    save_credentials_to_token_file
+)
 from app.config import (
     SCOPES,
     TOKEN_PATH,
@@ -20,156 +28,152 @@ from app.config import (
     GOOGLE_CLIENT_SECRET
 )
 
+if TYPE_CHECKING:
+    # Imported lazily at runtime: google_auth_oauthlib is only needed for /login and /callback
+    from google_auth_oauthlib.flow import Flow
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Get the base project directory for storage
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
-print(f"Base directory: {BASE_DIR}")
+logger.debug("Base directory: %s", BASE_DIR)
+# The app package directory, where /callback writes token.json
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+# Other places a token file may have been left, checked after TOKEN_PATH
+FALLBACK_TOKEN_PATHS = (
+    os.path.join(BASE_DIR, "token.json"),                 # In base dir
+    os.path.join(os.path.dirname(BASE_DIR), "token.json"),  # In parent dir
+    os.path.join(APP_ROOT, "token.json"),                 # App root
+)
 
-# Path to store state tokens - use absolute paths
-STATE_TOKENS_DIR = os.path.join(BASE_DIR, "data")
-STATE_TOKENS_PATH = os.path.join(STATE_TOKENS_DIR, "state_tokens.json")
-print(f"State tokens directory: {STATE_TOKENS_DIR}")
-print(f"State tokens path: {STATE_TOKENS_PATH}")
+# Create the token directory once at startup instead of before every token write;
+# APP_ROOT needs no check since this module lives in it
+try:
+    os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
+except OSError as e:
+    logger.error("Error creating token directory for %s: %s", TOKEN_PATH, e)
 
-# Store OAuth2 flow state
-oauth_flows = {}
-# Store state tokens in memory as well for redundancy
-memory_state_tokens = {}
+# Shared HTTPS connection pool for token exchanges, mounted on each Flow's
+# session so callbacks reuse TCP/TLS connections to oauth2.googleapis.com
+_token_http_adapter = None
 
-# Ensure the state tokens directory exists
-try:
-    os.makedirs(STATE_TOKENS_DIR, exist_ok=True)
-    print(f"Created directory: {STATE_TOKENS_DIR}")
-except Exception as e:
-    print(f"Error creating directory {STATE_TOKENS_DIR}: {e}")
-    print(traceback.format_exc())
-
-# Load state tokens from file or initialize empty dict
-def load_state_tokens() -> Dict[str, float]:
-    print(f"Loading state tokens from {STATE_TOKENS_PATH}")
-    file_tokens = {}
-    if os.path.exists(STATE_TOKENS_PATH):
-        try:
-            with open(STATE_TOKENS_PATH, 'r') as f:
-                content = f.read().strip()
-                print(f"State token file content length: {len(content)} bytes")
-                if content:
-                    file_tokens = json.loads(content)
-                    print(f"Loaded {len(file_tokens)} state tokens from file")
-                else:
-                    print("State token file is empty")
-        except json.JSONDecodeError as e:
-            print(f"JSON error loading state tokens from file: {e}")
-            print(traceback.format_exc())
-            # Try to recover the file by writing an empty dict
-            try:
-                with open(STATE_TOKENS_PATH, 'w') as f:
-                    json.dump({}, f)
-                print("Reset state tokens file to empty dictionary")
-            except Exception as write_err:
-                print(f"Could not reset state tokens file: {write_err}")
-        except Exception as e:
-            print(f"Error loading state tokens from file: {e}")
-            print(traceback.format_exc())
-    else:
-        print(f"State tokens file not found at {STATE_TOKENS_PATH}, initializing empty")
-    
-    # Combine file tokens with memory tokens for redundancy
-    combined_tokens = {**file_tokens, **memory_state_tokens}
-    
-    # Clean up expired tokens (older than 10 minutes)
-    current_time = time.time()
-    valid_tokens = {k: v for k, v in combined_tokens.items() if current_time - v < 600}
-    
-    print(f"Using {len(valid_tokens)} valid state tokens after combining sources")
+# OAuth state tokens are stateless: base64url(nonce || issued_ms || HMAC(key, nonce || issued_ms)[:16]),
+# so /login and /callback share nothing but the signing key. The key comes from
+# SECRET_KEY, or failing that from the OAuth client secret, so every worker agrees.
+STATE_TOKEN_TTL = 600  # seconds
+STATE_TOKEN_BYTES = 16
+STATE_TOKEN_MAC_BYTES = 16
+# Issue time in milliseconds, fine enough to tell a token from a revocation in the same second
+_STATE_TOKEN_ISSUED = struct.Struct(">Q")
+_STATE_TOKEN_LENGTH = STATE_TOKEN_BYTES + _STATE_TOKEN_ISSUED.size + STATE_TOKEN_MAC_BYTES
+# Touched to revoke every state token issued before its mtime, in all workers;
+# kept in data/ with the other runtime state rather than in the source tree
+STATE_TOKEN_REVOCATION_PATH = os.path.join(BASE_DIR, "data", "state_tokens_revoked")
+# Key derived from the OAuth client secret, as (client secret, key)
+_state_token_key: Optional[Tuple[str, bytes]] = None
+
+
+def _get_state_token_key() -> bytes:
+    """Resolve the state token signing key, after .env has been loaded"""
+    global _state_token_key
+    secret_key = os.getenv("SECRET_KEY", "")
+    if secret_key:
+        return secret_key.encode()
     
-    # Save the combined tokens back to file and memory
-    save_state_tokens(valid_tokens)
-    memory_state_tokens.clear()
-    memory_state_tokens.update(valid_tokens)
+    client_config = _get_client_config() or {}
+    client_secret = next((section.get("client_secret") for section in client_config.values()
+                          if isinstance(section, dict)), None)
+    if not client_secret:
+        # Nothing to sign with yet; /login and /callback fail without a client anyway,
+        # so use a throwaway key and resolve again once credentials are uploaded
+        logger.warning("SECRET_KEY is not set and no OAuth client is configured")
+        return secrets.token_bytes(32)
     
-    return valid_tokens
+    # Derive again whenever credentials.json is replaced, so all workers follow the new secret
+    if _state_token_key is None or _state_token_key[0] != client_secret:
+        # Derived rather than used directly, so the MAC never exposes the client secret
+        _state_token_key = (client_secret, hmac.new(client_secret.encode(), b"oauth-state-token", hashlib.sha256).digest())
+    return _state_token_key[1]
+
+
+def _sign_state(payload: bytes) -> bytes:
+    """Return the truncated HMAC-SHA256 of a state token's nonce and issue time"""
+    return hmac.new(_get_state_token_key(), payload, hashlib.sha256).digest()[:STATE_TOKEN_MAC_BYTES]
 
-# Save state tokens to file
-def save_state_tokens(tokens: Dict[str, float]):
+
+def _issue_state_token() -> str:
+    """Generate a signed state token that expires after STATE_TOKEN_TTL"""
+    payload = secrets.token_bytes(STATE_TOKEN_BYTES) + _STATE_TOKEN_ISSUED.pack(time.time_ns() // 1_000_000)
+    return urlsafe_b64encode(payload + _sign_state(payload)).rstrip(b'=').decode()
+
+
+def _verify_state_token(state: str) -> bool:
+    """Check a state token's signature, expiry and revocation cutoff"""
     try:
-        # Ensure directory exists
-        os.makedirs(STATE_TOKENS_DIR, exist_ok=True)
-        
-        # Validate the tokens dict before saving
-        for key, value in list(tokens.items()):
-            if not isinstance(key, str) or not isinstance(value, (int, float)):
-                print(f"Removing invalid token entry: {key}:{value}")
-                del tokens[key]
-        
-        # Write tokens to file
-        token_json = json.dumps(tokens)
-        print(f"Writing {len(tokens)} state tokens to file, content length: {len(token_json)} bytes")
-        
-        with open(STATE_TOKENS_PATH, 'w') as f:
-            f.write(token_json)
-            print(f"Saved {len(tokens)} state tokens to {STATE_TOKENS_PATH}")
-        
-        # Verify file was written successfully
-        if os.path.exists(STATE_TOKENS_PATH):
-            file_size = os.path.getsize(STATE_TOKENS_PATH)
-            print(f"Verified state token file exists, size: {file_size} bytes")
-        else:
-            print(f"WARNING: State token file does not exist after save attempt")
-        
-        # Update memory tokens too
-        memory_state_tokens.clear()
-        memory_state_tokens.update(tokens)
-    except Exception as e:
-        print(f"Error saving state tokens to file: {e}")
-        print(traceback.format_exc())
-        
-        # If file save fails, at least keep in memory
-        memory_state_tokens.clear()
-        memory_state_tokens.update(tokens)
-        print(f"Keeping {len(tokens)} state tokens in memory as fallback")
-
-# Clean up expired tokens
-def clear_expired_tokens():
-    """Clear expired state tokens"""
-    global state_tokens
-    global memory_state_tokens
-    
-    current_time = time.time()
-    
-    # Tokens older than 10 minutes (600 seconds) are considered expired
-    expired_time = current_time - 600
-    
-    # Remove expired tokens from state_tokens
-    expired_tokens = [k for k, v in state_tokens.items() if v < expired_time]
-    for token in expired_tokens:
-        if token in state_tokens:
-            del state_tokens[token]
-    
-    # Remove expired tokens from memory_state_tokens
-    memory_expired = [k for k, v in memory_state_tokens.items() if v < expired_time]
-    for token in memory_expired:
-        if token in memory_state_tokens:
-            del memory_state_tokens[token]
-    
-    # Save updated tokens
-    save_state_tokens(state_tokens)
-    
-    print(f"Cleared {len(expired_tokens)} expired state tokens from file")
-    print(f"Cleared {len(memory_expired)} expired state tokens from memory")
-    print(f"Remaining state tokens: {len(state_tokens)}")
+        raw = urlsafe_b64decode(state + '=' * (-len(state) % 4))
+    except ValueError:
+        return False
+    if len(raw) != _STATE_TOKEN_LENGTH:
+        return False
+    payload, mac = raw[:-STATE_TOKEN_MAC_BYTES], raw[-STATE_TOKEN_MAC_BYTES:]
+    if not hmac.compare_digest(mac, _sign_state(payload)):
+        return False
+    (issued_ms,) = _STATE_TOKEN_ISSUED.unpack_from(payload, STATE_TOKEN_BYTES)
+    issued_ns = issued_ms * 1_000_000
+    if time.time_ns() >= issued_ns + STATE_TOKEN_TTL * 1_000_000_000:
+        return False
+    revoked = _stat_or_none(STATE_TOKEN_REVOCATION_PATH)
+    return revoked is None or issued_ns > revoked.st_mtime_ns
 
-# Initialize state tokens
-try:
-    state_tokens = load_state_tokens()
-    print(f"Initialized with {len(state_tokens)} state tokens")
-    # Clear any expired tokens on startup
-    clear_expired_tokens()
-except Exception as e:
-    print(f"Error initializing state tokens: {e}")
-    print(traceback.format_exc())
-    state_tokens = {}
+
+def _revoke_state_tokens():
+    """Invalidate every outstanding state token, in every worker, without changing the key"""
+    os.makedirs(os.path.dirname(STATE_TOKEN_REVOCATION_PATH), exist_ok=True)
+    with open(STATE_TOKEN_REVOCATION_PATH, 'a'):
+        pass
+    # Stamp the exact time; the kernel's own mtime comes from a coarse clock
+    now_ns = time.time_ns()
+    os.utime(STATE_TOKEN_REVOCATION_PATH, ns=(now_ns, now_ns))
+
+
+def _mount_shared_adapter(flow: "Flow"):
+    """Route the flow's token requests through the process-wide connection pool."""
+    global _token_http_adapter
+    if _token_http_adapter is None:
+        from requests.adapters import HTTPAdapter
+        _token_http_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+    flow.oauth2session.mount("https://", _token_http_adapter)
+
+
+# OAuth client config from the environment, fixed for the life of the process
+_ENV_CLIENT_CONFIG: Optional[dict] = {
+    "web": {
+        "client_id": GOOGLE_CLIENT_ID,
+        "client_secret": GOOGLE_CLIENT_SECRET,
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "redirect_uris": [REDIRECT_URI]
+    }
+} if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET else None
+
+
+def _get_client_config() -> Optional[dict]:
+    """Get the Google OAuth client config from the environment or credentials file"""
+    if _ENV_CLIENT_CONFIG is not None:
+        logger.debug("Using client ID and secret from environment variables")
+        return _ENV_CLIENT_CONFIG
+    # Fallback to using credentials.json; get_google_credentials_data() re-parses it
+    # whenever it changes, so an upload handled by any worker is picked up by all
+    logger.debug("Using client ID and secret from credentials file")
+    return get_google_credentials_data()
+
+
+def _new_flow(client_config: dict) -> "Flow":
+    """Build the OAuth flow shared by /login and /callback"""
+    from google_auth_oauthlib.flow import Flow
+    return Flow.from_client_config(client_config, scopes=SCOPES, redirect_uri=REDIRECT_URI)
 
 
 class AuthStatus(BaseModel):
@@ -182,155 +186,170 @@ class AuthStatus(BaseModel):
     email: Optional[str] = None
 
 
-@router.get("/status", response_model=AuthStatus)
-async def get_auth_status():
-    """Get the current authentication status"""
-    # Check for credentials in multiple locations
-    token_paths = [
-        TOKEN_PATH,                                                        # From config (app/token.json)
-        os.path.join(BASE_DIR, "token.json"),                             # In base dir
-        os.path.join(os.path.dirname(BASE_DIR), "token.json"),            # In parent dir
-        os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")), "token.json"),  # App root
-    ]
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    """Stat a path, returning None if it does not exist or is unreadable"""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _read_token_email(path: str) -> Optional[str]:
+    """Read a token file and return the account email it belongs to"""
+    with open(path, 'rb') as f:
+        token_data = orjson.loads(f.read())
+        # The email is extracted from the id_token when the token file is written
+        email = token_data.get('email', None)
+        refresh_token = token_data.get('refresh_token')
+        logger.debug("Token data: has refresh_token = %s", refresh_token is not None)
+    # Copy token to the intended location if found elsewhere
+    if path != TOKEN_PATH:
+        logger.info("Copying token from %s to %s", path, TOKEN_PATH)
+        try:
+            # Kernel-side copy (sendfile on Linux) instead of reading it into Python
+            shutil.copyfile(path, TOKEN_PATH)
+        except Exception as e:
+            logger.error("Error copying token: %s", e)
+    return email
+
+
+# Latest authentication status, kept current by refresh_auth_state_loop(), as
+# ((mtime_ns, size) of the files it was computed from, status, (JSON body, ETag)).
+# Always replaced as a whole so concurrent refreshes can't mix old and new parts.
+AUTH_STATE_REFRESH_INTERVAL = 2  # seconds
+# Status fields that never change after startup (TOKEN_PATH can be moved by /callback)
+_BASE_STATUS = {"credentials_path": CREDENTIALS_PATH}
+_auth_state: Optional[Tuple[tuple, dict, Tuple[bytes, str]]] = None
+
+
+def _compute_auth_state(current: Optional[tuple],
+                        known_email: Optional[Tuple[str, Optional[str]]] = None) -> Optional[Tuple[tuple, dict]]:
+    """Probe the token and credentials files and build the authentication status, or None if unchanged"""
+    # Check for credentials in multiple locations, starting with TOKEN_PATH from config
+    token_paths = (TOKEN_PATH, *FALLBACK_TOKEN_PATHS)
+    token_stats = [_stat_or_none(path) for path in token_paths]
+    credentials_st = _stat_or_none(CREDENTIALS_PATH)
     
-    print("Checking token paths:")
-    for idx, path in enumerate(token_paths):
-        print(f"  Path {idx+1}: {path}, exists: {os.path.exists(path)}")
+    # Nothing changed on disk since the last probe
+    signature = tuple(
+        (st.st_mtime_ns, st.st_size) if st is not None else None
+        for st in (*token_stats, credentials_st)
+    )
+    if current is not None and signature == current[0]:
+        return None
     
     token_exists = False
     token_path_found = None
     email = None
     
-    for path in token_paths:
-        if os.path.exists(path):
+    for path, st in zip(token_paths, token_stats):
+        if st is not None:
             token_exists = True
             token_path_found = path
-            print(f"Found token file at: {path}")
             try:
-                with open(path, 'r') as f:
-                    token_data = json.load(f)
-                    email = token_data.get('email', None)
-                    refresh_token = token_data.get('refresh_token')
-                    print(f"Token data: has refresh_token = {refresh_token is not None}")
-                    
-                    if not email and 'id_token' in token_data:
-                        # Try to extract email from id_token if available
-                        import base64
-                        id_token = token_data['id_token']
-                        # Extract the payload part (second segment)
-                        if id_token:
-                            payload = id_token.split('.')[1]
-                            # Add padding if needed
-                            payload += '=' * (4 - len(payload) % 4) if len(payload) % 4 else ''
-                            try:
-                                decoded = base64.b64decode(payload).decode('utf-8')
-                                payload_data = json.loads(decoded)
-                                email = payload_data.get('email', None)
-                            except:
-                                pass
-                # Copy token to the intended location if found elsewhere
-                if path != TOKEN_PATH:
-                    print(f"Copying token from {path} to {TOKEN_PATH}")
-                    try:
-                        os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
-                        with open(path, 'r') as src, open(TOKEN_PATH, 'w') as dst:
-                            dst.write(src.read())
-                    except Exception as e:
-                        print(f"Error copying token: {e}")
-            except Exception as e:
-                print(f"Error reading token from {path}: {e}")
+                # (path, email) of a token file /callback just wrote; no need to read it back
+                if known_email is not None and known_email[0] == path:
+                    email = known_email[1]
+                else:
+                    email = _read_token_email(path)
+            except (OSError, ValueError) as e:
+                # Unreadable or corrupt token file (JSONDecodeError is a ValueError)
+                logger.warning("Error reading token from %s: %s", path, e)
             break
     
     # Check if we have client ID and secret configured
-    credentials_exist = (GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET) or get_google_credentials_data() is not None
-
-    print(f"Auth status: is_authenticated={token_exists}, token_path={token_path_found}")
+    credentials_exist = bool(GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET) or get_google_credentials_data() is not None
     
-    return {
+    return signature, {
         "is_authenticated": token_exists,
         "credentials_exist": credentials_exist,
         "token_exists": token_exists,
-        "credentials_path": CREDENTIALS_PATH,
+        **_BASE_STATUS,
         "token_path": token_path_found or TOKEN_PATH,
         "email": email
     }
 
 
+def _refresh_auth_state(known_email: Optional[Tuple[str, Optional[str]]] = None) -> Tuple[bytes, str]:
+    """Recompute the cached authentication status and return it serialized with its ETag"""
+    global _auth_state
+    current = _auth_state
+    computed = _compute_auth_state(current, known_email)
+    if computed is None:
+        return current[2]
+    signature, state = computed
+    if current is not None and state == current[1]:
+        response = current[2]
+    else:
+        logger.info("Auth status: is_authenticated=%s, token_path=%s", state['is_authenticated'], state['token_path'])
+        body = orjson.dumps(state)
+        response = (body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+    # A refresh that started before a newer one may still land last, but with its
+    # own older signature, so the next probe notices and recomputes
+    _auth_state = (signature, state, response)
+    return response
+
+
+def _invalidate_auth_state():
+    """Make the next /status call recompute the authentication status"""
+    global _auth_state
+    _auth_state = None
+
+
+async def refresh_auth_state_loop():
+    """Background task that keeps the authentication status current"""
+    while True:
+        try:
+            await run_in_threadpool(_refresh_auth_state)
+        except Exception as e:
+            logger.error("Error refreshing auth status: %s", e)
+        await asyncio.sleep(AUTH_STATE_REFRESH_INTERVAL)
+
+
+@router.get("/status", response_model=AuthStatus)
+async def get_auth_status(request: Request):
+    """Get the current authentication status"""
+    # Serve the pre-serialized snapshot directly, skipping response model validation
+    snapshot = _auth_state
+    if snapshot is not None:
+        cached = snapshot[2]
+    else:
+        cached = await run_in_threadpool(_refresh_auth_state)
+    body, etag = cached
+    # Pollers revalidate with If-None-Match and get an empty 304 while nothing changed
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/login")
 async def login(request: Request, response: Response):
     """Initiate Google OAuth login flow"""
-    global state_tokens
-    
     try:
         # Debug statements for inputs
-        print(f"REDIRECT_URI: {REDIRECT_URI}")
-        print(f"CREDENTIALS_PATH: {CREDENTIALS_PATH}")
-        print(f"GOOGLE_CLIENT_ID: {GOOGLE_CLIENT_ID}")
-        print(f"GOOGLE_CLIENT_SECRET: {'[REDACTED]' if GOOGLE_CLIENT_SECRET else 'None'}")
-        
-        # Clear expired tokens first
-        clear_expired_tokens()
+        logger.debug("REDIRECT_URI: %s", REDIRECT_URI)
+        logger.debug("CREDENTIALS_PATH: %s", CREDENTIALS_PATH)
+        logger.debug("GOOGLE_CLIENT_ID: %s", GOOGLE_CLIENT_ID)
+        logger.debug("GOOGLE_CLIENT_SECRET: %s", '[REDACTED]' if GOOGLE_CLIENT_SECRET else 'None')
         
-        # Reload state tokens to make sure we have the latest
-        state_tokens = load_state_tokens()
-        
-        # Clean existing state tokens (remove expired ones)
-        current_time = time.time()
-        expired_states = [k for k, v in state_tokens.items() if current_time - v > 600]
-        for state in expired_states:
-            if state in state_tokens:
-                del state_tokens[state]
-        
-        # Generate a state token to prevent CSRF
-        state = secrets.token_urlsafe(32)
-        
-        # Save state token with timestamp
-        state_tokens[state] = time.time()
-        memory_state_tokens[state] = time.time()  # Also store in memory
-        save_state_tokens(state_tokens)
+        # Generate a signed state token to prevent CSRF; nothing is stored server-side
+        state = _issue_state_token()
         
         # Debug output
-        print(f"Generated state token: {state[:5]}...{state[-5:]}")
-        print(f"State tokens count: {len(state_tokens)}")
-        print(f"Memory state tokens count: {len(memory_state_tokens)}")
+        logger.debug("Generated state token: %s...%s", state[:5], state[-5:])
+        
+        client_config = _get_client_config()
+        if not client_config:
+            raise HTTPException(
+                status_code=400, 
+                detail="Google credentials not found. Please upload credentials.json or set environment variables."
+            )
         
         # Create the OAuth flow object
         try:
-            if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
-                print("Using client ID and secret from environment variables")
-                flow = Flow.from_client_config(
-                    {
-                        "web": {
-                            "client_id": GOOGLE_CLIENT_ID,
-                            "client_secret": GOOGLE_CLIENT_SECRET,
-                            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                            "token_uri": "https://oauth2.googleapis.com/token",
-                            "redirect_uris": [REDIRECT_URI]
-                        }
-                    },
-                    scopes=SCOPES,
-                    redirect_uri=REDIRECT_URI
-                )
-            else:
-                # Fallback to using credentials.json
-                print("Using client ID and secret from credentials file")
-                creds_data = get_google_credentials_data()
+            flow = _new_flow(client_config)
                 
-                if not creds_data:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail="Google credentials not found. Please upload credentials.json or set environment variables."
-                    )
-                    
-                flow = Flow.from_client_config(
-                    creds_data,
-                    scopes=SCOPES,
-                    redirect_uri=REDIRECT_URI
-                )
-                
-            # Store the flow using the state token
-            oauth_flows[state] = flow
-            
             # Get the authorization URL
             # IMPORTANT: Always request offline access and force consent to ensure we get a refresh token
             auth_url, _ = flow.authorization_url(
@@ -340,24 +359,19 @@ async def login(request: Request, response: Response):
                 state=state                        # Include state for CSRF protection
             )
             
-            print(f"Generated authorization URL with state: {state[:5]}...")
+            logger.info("Generated authorization URL with state: %s...", state[:5])
             
             # Redirect to the authorization URL
             return RedirectResponse(auth_url)
         except Exception as e:
-            print(f"Error creating OAuth flow: {e}")
-            print(traceback.format_exc())
+            logger.exception("Error creating OAuth flow: %s", e)
             raise HTTPException(status_code=500, detail=f"Failed to create OAuth flow: {str(e)}")
-        
-        # Redirect to the authorization URL
-        return RedirectResponse(auth_url)
     except HTTPException:
         # Re-raise HTTP exceptions without modification
         raise
     except Exception as e:
         error_detail = f"Error initiating authentication: {str(e)}"
-        print(f"ERROR: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception(error_detail)
         raise HTTPException(
             status_code=500, 
             detail=error_detail
@@ -367,18 +381,17 @@ async def login(request: Request, response: Response):
 @router.get("/callback")
 async def callback(request: Request, state: Optional[str] = None, code: Optional[str] = None, error: Optional[str] = None):
     """Handle OAuth callback"""
-    global state_tokens
     global TOKEN_PATH
     
     # Check if state is missing
     if not state:
-        print("State parameter is missing from callback")
+        logger.warning("State parameter is missing from callback")
         return JSONResponse(
             status_code=400,
             content={"status": "error", "message": "State parameter is missing. Authentication failed."}
         )
     
-    print(f"Callback received with state: {state[:5]}...{state[-5:] if len(state) > 10 else state}")
+    logger.info("Callback received with state: %s...%s", state[:5], state[-5:] if len(state) > 10 else state)
     
     # Check for errors
     if error:
@@ -388,112 +401,64 @@ async def callback(request: Request, state: Optional[str] = None, code: Optional
         )
     
     try:
-        # Clear expired tokens first
-        clear_expired_tokens()
-        
-        # Reload state tokens to ensure we have the latest
-        state_tokens = load_state_tokens()
-        
-        # Debug logging
-        print(f"Current state tokens: {list(state_tokens.keys())}")
-        print(f"Current memory state tokens: {list(memory_state_tokens.keys())}")
-        
-        # Verify state token from persistent storage or memory
-        is_valid_state = (state in state_tokens) or (state in memory_state_tokens)
-        
-        # TEMPORARY WORKAROUND: Skip state validation
-        is_valid_state = True
-        print("⚠️ TEMPORARY WORKAROUND: Skipping state validation")
-        
-        if not is_valid_state:
-            print(f"Invalid state token. Known states in file: {list(state_tokens.keys())[:3]}")
-            print(f"Known states in memory: {list(memory_state_tokens.keys())[:3]}")
+        # Verify the state token's signature, expiry and revocation cutoff
+        if not _verify_state_token(state):
+            # Never log live state values; they are the CSRF secret
+            logger.warning("Invalid or expired state token")
             return JSONResponse(
                 status_code=400,
                 content={"status": "error", "message": "Invalid state parameter. Authentication failed."}
             )
         
-        # Get the flow
-        flow = oauth_flows.get(state)
-        if not flow:
-            print("Flow not found for this state token, attempting to recreate it")
-            # Try to recreate the flow
-            try:
-                if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
-                    print("Recreating flow using environment variables")
-                    flow = Flow.from_client_config(
-                        {
-                            "web": {
-                                "client_id": GOOGLE_CLIENT_ID,
-                                "client_secret": GOOGLE_CLIENT_SECRET,
-                                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                                "token_uri": "https://oauth2.googleapis.com/token",
-                                "redirect_uris": [REDIRECT_URI]
-                            }
-                        },
-                        scopes=SCOPES,
-                        redirect_uri=REDIRECT_URI
-                    )
-                else:
-                    # Fall back to credentials file
-                    print("Recreating flow using credentials file")
-                    creds_data = get_google_credentials_data()
-                    if not creds_data:
-                        print("Cannot recreate flow, no credentials available")
-                        return JSONResponse(
-                            status_code=400,
-                            content={"status": "error", "message": "Authentication session expired and cannot be recreated. Please try again."}
-                        )
-                    
-                    flow = Flow.from_client_config(
-                        creds_data,
-                        scopes=SCOPES,
-                        redirect_uri=REDIRECT_URI
-                    )
-                print("Successfully recreated flow")
-            except Exception as e:
-                print(f"Failed to recreate flow: {e}")
-                print(traceback.format_exc())
+        # Rebuild the flow from the client config; /login keeps no per-state flow
+        try:
+            client_config = _get_client_config()
+            if not client_config:
+                logger.error("Cannot recreate flow, no credentials available")
                 return JSONResponse(
                     status_code=400,
-                    content={"status": "error", "message": "Authentication session expired. Please try again."}
+                    content={"status": "error", "message": "Authentication session expired and cannot be recreated. Please try again."}
                 )
-        
-        # Remove the used state token
-        if state in oauth_flows:
-            del oauth_flows[state]
-        if state in state_tokens:
-            del state_tokens[state]
-        if state in memory_state_tokens:
-            del memory_state_tokens[state]
-        save_state_tokens(state_tokens)
+            
+            flow = _new_flow(client_config)
+            logger.debug("Successfully recreated flow")
+        except Exception as e:
+            logger.exception("Failed to recreate flow: %s", e)
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Authentication session expired. Please try again."}
+            )
         
         # Clear existing token if any
-        if os.path.exists(TOKEN_PATH):
+        try:
             os.remove(TOKEN_PATH)
-            print(f"Removed existing token file: {TOKEN_PATH}")
+            _invalidate_auth_state()
+            logger.info("Removed existing token file: %s", TOKEN_PATH)
+        except FileNotFoundError:
+            pass
         
         # Exchange the authorization code for credentials
         try:
-            print(f"Attempting to exchange authorization code for credentials...")
-            print(f"REDIRECT_URI in use: {REDIRECT_URI}")
+            logger.info("Attempting to exchange authorization code for credentials")
+            logger.debug("REDIRECT_URI in use: %s", REDIRECT_URI)
             
             # Debug info - but mask sensitive data
-            code_debug = code[:5] + "..." if code else "None"
-            print(f"Code (truncated): {code_debug}")
-            print(f"Using flow object with redirect_uri: {flow.redirect_uri}")
+            logger.debug("Code (truncated): %s", code[:5] + "..." if code else "None")
+            logger.debug("Using flow object with redirect_uri: %s", flow.redirect_uri)
             
             # Explicitly set redirect_uri on the flow again to ensure it matches
             flow.redirect_uri = REDIRECT_URI
             
-            # Add small timeout before token exchange to avoid timing issues
-            time.sleep(1)
+            # Add small timeout before token exchange to avoid timing issues,
+            # without blocking other requests on the event loop
+            await asyncio.sleep(1)
             
-            # Exchange code for tokens
-            flow.fetch_token(code=code)
+            # Exchange code for tokens; the HTTPS round trip to Google runs off the event loop
+            _mount_shared_adapter(flow)
+            await run_in_threadpool(flow.fetch_token, code=code)
             credentials = flow.credentials
             
-            print("Successfully obtained credentials from Google")
+            logger.info("Successfully obtained credentials from Google")
             
             # Save the credentials - enhanced error handling
             try:
@@ -517,83 +482,62 @@ async def callback(request: Request, state: Optional[str] = None, code: Optional
                 email = None
                 if hasattr(credentials, 'id_token') and credentials.id_token:
                     try:
-                        # Parse JWT payload (second part of the token)
-                        import base64
-                        jwt_segments = credentials.id_token.split('.')
-                        if len(jwt_segments) >= 2:
-                            payload = jwt_segments[1]
-                            # Add padding if needed
-                            payload += '=' * (4 - len(payload) % 4) if len(payload) % 4 else ''
-                            # Decode base64
-                            decoded = base64.b64decode(payload).decode('utf-8')
-                            token_data_jwt = json.loads(decoded)
-                            if 'email' in token_data_jwt:
-                                email = token_data_jwt['email']
-                                token_data['email'] = email  # Add to token data
-                    except Exception as e:
-                        print(f"Error extracting email from id_token: {e}")
+                        # Store the email with the token so /status never has to decode the JWT
+                        email = decode_id_token_payload(credentials.id_token).get('email')
+                        if email is not None:
+                            token_data['email'] = email  # Add to token data
+                    except ValueError as e:
+                        # Covers binascii.Error, UnicodeDecodeError and JSONDecodeError
+                        logger.warning("Error extracting email from id_token: %s", e)
                 
                 # IMPORTANT FIX: Explicitly set token path to app root directory
-                app_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+                app_root = APP_ROOT
                 explicit_token_path = os.path.join(app_root, "token.json")
-                print(f"Setting explicit token path in app root: {explicit_token_path}")
-                
-                # Ensure the app directory exists (it should, but check anyway)
-                try:
-                    os.makedirs(app_root, exist_ok=True)
-                    print(f"App root directory exists: {os.path.exists(app_root)}")
-                    print(f"App root directory writable: {os.access(app_root, os.W_OK)}")
-                except Exception as app_dir_error:
-                    print(f"Error with app root directory: {app_dir_error}")
+                logger.debug("Setting explicit token path in app root: %s", explicit_token_path)
                 
                 # Try to write the token directly to the app directory first
                 try:
-                    print(f"Writing token directly to app root: {explicit_token_path}")
-                    with open(explicit_token_path, 'w') as f:
-                        json.dump(token_data, f)
-                    print(f"Successfully wrote token to {explicit_token_path}")
+                    logger.debug("Writing token directly to app root: %s", explicit_token_path)
+                    with open(explicit_token_path, 'wb') as f:
+                        f.write(orjson.dumps(token_data))
+                    logger.info("Successfully wrote token to %s", explicit_token_path)
                     
                     # Update TOKEN_PATH to this new location
                     TOKEN_PATH = explicit_token_path
                     
                     # Verify the file was created
-                    if os.path.exists(explicit_token_path):
-                        print(f"Verified token file exists at {explicit_token_path}")
-                    else:
-                        print(f"ERROR: Token file was not created at {explicit_token_path}")
+                    if _stat_or_none(explicit_token_path) is None:
+                        logger.error("Token file was not created at %s", explicit_token_path)
                         raise Exception("Token file was not created")
                     
+                    # Rebuild the status with the email we already have instead of re-reading the file
+                    _invalidate_auth_state()
+                    _refresh_auth_state((explicit_token_path, email))
+                    
                 except Exception as explicit_error:
-                    print(f"Failed to write token to app root: {explicit_error}")
-                    print(traceback.format_exc())
+                    logger.exception("Failed to write token to app root: %s", explicit_error)
                     
                     # Continue with the original path as fallback
-                    print(f"Falling back to original TOKEN_PATH: {TOKEN_PATH}")
-                    
-                    # Ensure the directory exists
-                    token_dir = os.path.dirname(TOKEN_PATH)
-                    
-                    try:
-                        os.makedirs(token_dir, exist_ok=True)
-                        print(f"Created token directory: {token_dir}")
-                    except Exception as dir_error:
-                        print(f"ERROR creating token directory: {dir_error}")
+                    logger.info("Falling back to original TOKEN_PATH: %s", TOKEN_PATH)
                     
                     # Try to save using credential_utils helper
                     try:
                         success = save_credentials_to_token_file(credentials, TOKEN_PATH)
                         if success:
-                            print(f"Successfully saved token using credential utility")
+                            logger.info("Successfully saved token using credential utility")
                         else:
-                            print(f"Failed to save token with utility, trying direct approach")
+                            logger.warning("Failed to save token with utility, trying direct approach")
                             
                             # Fallback - Write token directly
-                            with open(TOKEN_PATH, 'w') as f:
-                                json.dump(token_data, f)
-                            print(f"Direct token write successful")
+                            with open(TOKEN_PATH, 'wb') as f:
+                                f.write(orjson.dumps(token_data))
+                            logger.info("Direct token write successful")
                     except Exception as save_error:
-                        print(f"ERROR saving token: {save_error}")
+                        logger.error("Error saving token: %s", save_error)
                     
+                    # The token file changed, so /status must not serve the old state
+                    _invalidate_auth_state()
+                
                 # Check if this is a direct or ajax request
                 accept_header = request.headers.get("accept", "")
                 if "json" in accept_header.lower():
@@ -610,25 +554,22 @@ async def callback(request: Request, state: Optional[str] = None, code: Optional
                     # This will trigger a refresh of the auth status
                     return RedirectResponse("/settings?auth_success=true")
             except Exception as e:
-                print(f"ERROR: Failed to save credentials to token file: {e}")
-                print(traceback.format_exc())
+                logger.exception("Failed to save credentials to token file: %s", e)
                 return JSONResponse(
                     status_code=500,
                     content={"status": "error", "message": f"Failed to save token: {str(e)}"}
                 )
         except Exception as e:
-            print(f"Error exchanging authorization code: {e}")
-            print(traceback.format_exc())
+            logger.exception("Error exchanging authorization code: %s", e)
             
             # Handle common OAuth errors
             error_message = str(e)
             if "invalid_grant" in error_message:
                 # Add more debug info to trace the problem
-                print("Invalid grant error details:")
-                print(f"Code exists: {bool(code)}")
-                print(f"Code length: {len(code) if code else 0}")
-                print(f"Redirect URI: {REDIRECT_URI}")
-                print(f"Flow redirect URI: {flow.redirect_uri}")
+                logger.debug(
+                    "Invalid grant error details: code exists=%s, code length=%d, redirect URI=%s, flow redirect URI=%s",
+                    bool(code), len(code) if code else 0, REDIRECT_URI, flow.redirect_uri
+                )
                 
                 error_details = "The authorization code has expired or already been used. Please try authenticating again."
                 # Check if we should provide more specific guidance
@@ -649,14 +590,23 @@ async def callback(request: Request, state: Optional[str] = None, code: Optional
             )
             
     except Exception as e:
-        print(f"Unexpected error in callback: {e}")
-        print(traceback.format_exc())
+        logger.exception("Unexpected error in callback: %s", e)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": f"Failed to exchange auth code: {str(e)}"}
         )
 
 
+# Copy uploads in 1 MiB chunks instead of shutil's 64 KiB default
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _save_upload(file: UploadFile, path: str):
+    """Write an uploaded file to disk"""
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, UPLOAD_COPY_BUFFER_SIZE)
+
+
 @router.post("/upload-credentials")
 async def upload_credentials(file: UploadFile = File(...)):
     """Upload Google API credentials file"""
@@ -665,11 +615,15 @@ async def upload_credentials(file: UploadFile = File(...)):
             raise HTTPException(
                 status_code=400, detail="File must be named credentials.json")
 
-        # Save the file
-        with open(CREDENTIALS_PATH, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save the file without blocking the event loop
+        await run_in_threadpool(_save_upload, file, CREDENTIALS_PATH)
+        
+        _invalidate_auth_state()
 
         return {"status": "success", "message": "Credentials uploaded successfully"}
+    except HTTPException:
+        # Keep the 400 for a wrongly named file instead of turning it into a 500
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error uploading credentials: {str(e)}")
@@ -677,38 +631,35 @@ async def upload_credentials(file: UploadFile = File(...)):
         file.file.close()
 
 
+def _remove_token_files(token_paths: Tuple[str, ...]) -> List[str]:
+    """Delete whichever token files exist and return the paths that were removed"""
+    cleared_paths = []
+    for path in token_paths:
+        try:
+            os.remove(path)
+            cleared_paths.append(path)
+            logger.info("Successfully removed token file: %s", path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error("Error removing token file %s: %s", path, e)
+    return cleared_paths
+
+
 @router.post("/reset-auth")
 async def reset_auth():
     """Reset authentication by removing token file and clearing the state"""
     try:
-        # Clear token file if it exists
-        token_paths = [
-            TOKEN_PATH,                  # From config 
-            os.path.join(BASE_DIR, "token.json"),  # In base dir
-            os.path.join(os.path.dirname(BASE_DIR), "token.json"),  # In parent dir
-            os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")), "token.json")  # App root
-        ]
-        
-        # Keep track of which paths were cleared
-        cleared_paths = []
-        
-        for path in token_paths:
-            if os.path.exists(path):
-                try:
-                    print(f"Removing token file: {path}")
-                    os.remove(path)
-                    cleared_paths.append(path)
-                    print(f"Successfully removed token file: {path}")
-                except Exception as e:
-                    print(f"Error removing token file {path}: {e}")
+        # Invalidate state tokens first, so a failure here leaves the token files untouched
+        await run_in_threadpool(_revoke_state_tokens)
+        logger.info("State tokens cleared")
         
-        # Clear OAuth flows and state tokens
-        oauth_flows.clear()
-        state_tokens.clear()
-        memory_state_tokens.clear()
-        save_state_tokens({})
+        # Clear token file if it exists
+        token_paths = (TOKEN_PATH, *FALLBACK_TOKEN_PATHS)
         
-        print("OAuth flows and state tokens cleared")
+        # Keep track of which paths were cleared, without blocking the event loop
+        cleared_paths = await run_in_threadpool(_remove_token_files, token_paths)
+        _invalidate_auth_state()
         
         # Inform user which paths were cleared
         if cleared_paths:
@@ -716,38 +667,23 @@ async def reset_auth():
         else:
             return {"status": "success", "message": "Authentication reset. No token files were found to remove."}
     except Exception as e:
-        print(f"Error resetting auth: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error resetting auth: %s", e)
         return {"status": "error", "message": f"Failed to reset authentication: {str(e)}"}
 
 @router.post("/clear-state-tokens")
 @router.get("/clear-state-tokens")
 async def clear_state_tokens():
     """Clear all state tokens to reset the OAuth flow state"""
-    global state_tokens
-    global memory_state_tokens
-    global oauth_flows
-    
     try:
-        # Clear all dictionaries
-        token_count = len(state_tokens)
-        memory_count = len(memory_state_tokens)
-        flow_count = len(oauth_flows)
-        
-        state_tokens.clear()
-        memory_state_tokens.clear()
-        oauth_flows.clear()
-        
-        # Save empty state to file
-        save_state_tokens({})
+        # Tokens are not stored, so move the revocation cutoff past all of them
+        await run_in_threadpool(_revoke_state_tokens)
         
         return {
             "status": "success", 
-            "message": f"Successfully cleared {token_count} state tokens, {memory_count} memory tokens, and {flow_count} flows"
+            "message": "Successfully invalidated all outstanding state tokens"
         }
     except Exception as e:
-        print(f"Error clearing state tokens: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error clearing state tokens: %s", e)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": f"Error clearing state tokens: {str(e)}"}
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
+from sqlalchemy import Integer, column, delete, desc, func, or_, text
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 
-from app.models.database import get_db, ProcessedEmail
+from app.models.database import get_db, ProcessedEmail, processed_emails_fts_enabled
+from app.api.endpoints.stats import invalidate_dashboard_stats
 
 router = APIRouter()
 
@@ -25,6 +26,11 @@ class ProcessedEmailResponse(BaseModel):
         from_attributes = True
 
 
+# Columns selected for list responses, in ProcessedEmailResponse field order
+_RESPONSE_FIELDS = tuple(ProcessedEmailResponse.model_fields)
+_RESPONSE_COLUMNS = [getattr(ProcessedEmail, name) for name in _RESPONSE_FIELDS]
+
+
 class PaginatedResponse(BaseModel):
     data: List[ProcessedEmailResponse]
     total: int
@@ -32,18 +38,8 @@ class PaginatedResponse(BaseModel):
     page_size: int
 
 
-@router.get("/", response_model=PaginatedResponse)
-async def get_processed_emails(
-    page: int = Query(0, ge=0),
-    page_size: int = Query(10, ge=1, le=100),
-    status: Optional[str] = None,
-    search: Optional[str] = None,
-    days: Optional[int] = None,
-    db: Session = Depends(get_db)
-):
-    """Get processed emails with filtering and pagination"""
-    query = db.query(ProcessedEmail)
-
+def _apply_filters(query, status: Optional[str], search: Optional[str], days: Optional[int]):
+    """Apply the list endpoint's status, date and search filters to a query"""
     # Filter by status if provided
     if status:
         if status.lower() == "success":
@@ -54,11 +50,19 @@ async def get_processed_emails(
 
     # Filter by date if days provided
     if days:
-        from_date = datetime.now() - timedelta(days=days)
+        from_date = datetime.utcnow() - timedelta(days=days)
         query = query.filter(ProcessedEmail.processed_at >= from_date)
 
-    # Filter by search term if provided
-    if search:
+    # Filter by search term if provided, through the full-text index when it can match
+    if search and len(search) >= 3 and processed_emails_fts_enabled():
+        # Quoted as a single phrase so the term is matched literally as a substring
+        phrase = '"' + search.replace('"', '""') + '"'
+        query = query.filter(ProcessedEmail.id.in_(
+            text("SELECT rowid FROM processed_emails_fts WHERE processed_emails_fts MATCH :phrase")
+            .bindparams(phrase=phrase)
+            .columns(column("rowid", Integer))
+        ))
+    elif search:
         search_term = f"%{search}%"
         query = query.filter(
             or_(
@@ -68,15 +72,45 @@ async def get_processed_emails(
             )
         )
 
-    # Get total count for pagination
-    total = query.count()
+    return query
 
-    # Apply ordering and pagination
-    query = query.order_by(desc(ProcessedEmail.processed_at))
-    query = query.offset(page * page_size).limit(page_size)
+
+@router.get("/", response_model=PaginatedResponse)
+def get_processed_emails(
+    page: int = Query(0, ge=0),
+    page_size: int = Query(10, ge=1, le=100),
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    days: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Get processed emails with filtering and pagination"""
+    # Select plain columns rather than hydrating ORM instances
+    query = _apply_filters(db.query(*_RESPONSE_COLUMNS), status, search, days)
+
+    # Apply ordering and pagination, returning the filtered total with each
+    # row via a window function instead of a separate COUNT query
+    paged = query.add_columns(func.count().over().label("total"))
+    paged = paged.order_by(desc(ProcessedEmail.processed_at))
+    paged = paged.offset(page * page_size).limit(page_size)
 
     # Execute query
-    emails = query.all()
+    rows = paged.all()
+    # Rows come straight from the database, so skip re-validating them
+    emails = [
+        ProcessedEmailResponse.model_construct(**dict(zip(_RESPONSE_FIELDS, row)))
+        for row in rows
+    ]
+
+    # An empty page carries no total; only count when paging past the end
+    if rows:
+        total = rows[0].total
+    elif page == 0:
+        total = 0
+    else:
+        # Count the filtered rows directly rather than wrapping the query in a subquery
+        total = _apply_filters(
+            db.query(func.count(ProcessedEmail.id)), status, search, days).scalar()
 
     return {
         "data": emails,
@@ -87,38 +121,38 @@ async def get_processed_emails(
 
 
 @router.get("/{email_id}", response_model=ProcessedEmailResponse)
-async def get_processed_email(email_id: int, db: Session = Depends(get_db)):
+def get_processed_email(email_id: int, db: Session = Depends(get_db)):
     """Get a specific processed email by ID"""
-    email = db.query(ProcessedEmail).filter(
-        ProcessedEmail.id == email_id).first()
+    email = db.get(ProcessedEmail, email_id)
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     return email
 
 
 @router.delete("/{email_id}")
-async def delete_processed_email(email_id: int, db: Session = Depends(get_db)):
+def delete_processed_email(email_id: int, db: Session = Depends(get_db)):
     """Delete a processed email record"""
-    email = db.query(ProcessedEmail).filter(
-        ProcessedEmail.id == email_id).first()
-    if not email:
+    # Delete by primary key in one statement; no matched row means it doesn't exist
+    result = db.execute(
+        delete(ProcessedEmail).where(ProcessedEmail.id == email_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Email not found")
 
-    db.delete(email)
     db.commit()
+    invalidate_dashboard_stats()
 
     return {"status": "success", "message": "Email record deleted successfully"}
 
 
 @router.delete("/")
-async def clear_all_processed_emails(db: Session = Depends(get_db)):
+def clear_all_processed_emails(db: Session = Depends(get_db)):
     """Clear all processed email records"""
-    # Get count before deletion for reporting
-    count = db.query(ProcessedEmail).count()
-    
-    # Delete all records
-    db.query(ProcessedEmail).delete()
+    # Delete all records in one statement and report how many it removed
+    result = db.execute(
+        delete(ProcessedEmail).execution_options(synchronize_session=False))
+    count = result.rowcount
     db.commit()
+    invalidate_dashboard_stats()
     
     return {
         "status": "success", 
@@ -127,6 +161,6 @@ async def clear_all_processed_emails(db: Session = Depends(get_db)):
 
 
 @router.delete("", status_code=200)
-async def clear_all_processed_emails_no_slash(db: Session = Depends(get_db)):
+def clear_all_processed_emails_no_slash(db: Session = Depends(get_db)):
     """Clear all processed email records (endpoint without trailing slash)"""
-    return await clear_all_processed_emails(db)
+    return clear_all_processed_emails(db)
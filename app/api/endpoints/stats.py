@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import Dict, List, Any
+from sqlalchemy import func, desc, case, select
+import time
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 from app.models.database import get_db, EmailMonitorConfig, WebhookConfig, ProcessedEmail
@@ -9,33 +10,63 @@ from app.models.database import get_db, EmailMonitorConfig, WebhookConfig, Proce
 router = APIRouter()
 
 
-@router.get("/dashboard")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
-    """Get stats for the dashboard"""
-
-    # Count active webhooks
-    active_webhooks_count = db.query(func.count(WebhookConfig.id)).filter(
-        WebhookConfig.active == True).scalar() or 0
+# Dashboard stats are polled by the frontend; serve repeats from memory for a few seconds
+DASHBOARD_STATS_TTL = 5  # seconds
+_dashboard_stats: Optional[Tuple[float, Dict[str, Any]]] = None  # (expires_at, stats)
 
-    # Count active email configs
-    active_configs_count = db.query(func.count(EmailMonitorConfig.id)).filter(
-        EmailMonitorConfig.active == True).scalar() or 0
 
-    # Count total processed emails
-    total_emails = db.query(func.count(ProcessedEmail.id)).scalar() or 0
+def invalidate_dashboard_stats():
+    """Make the next dashboard request recompute the stats"""
+    global _dashboard_stats
+    _dashboard_stats = None
 
-    # Count successfully processed emails
-    success_emails = db.query(func.count(ProcessedEmail.id)).filter(
-        ProcessedEmail.forwarded_successfully == True).scalar() or 0
 
-    # Count emails processed in the last 24 hours
-    last_24h = datetime.now() - timedelta(days=1)
-    emails_24h = db.query(func.count(ProcessedEmail.id)).filter(
-        ProcessedEmail.processed_at >= last_24h).scalar() or 0
-
-    # Get recent emails (last 5)
-    recent_emails = db.query(ProcessedEmail).order_by(
-        desc(ProcessedEmail.processed_at)).limit(5).all()
+@router.get("/dashboard")
+def get_dashboard_stats(db: Session = Depends(get_db)):
+    """Get stats for the dashboard"""
+    global _dashboard_stats
+    cached = _dashboard_stats
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    stats = _compute_dashboard_stats(db)
+    _dashboard_stats = (time.monotonic() + DASHBOARD_STATS_TTL, stats)
+    return stats
+
+
+def _compute_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """Query the counts and recent emails shown on the dashboard"""
+    # Count active webhooks and email configs plus total, successful and
+    # last-24h processed emails in a single round trip
+    # processed_at is stored in UTC (datetime.utcnow)
+    last_24h = datetime.utcnow() - timedelta(days=1)
+    active_webhooks = db.query(func.count(WebhookConfig.id)).filter(
+        WebhookConfig.active == True).scalar_subquery()
+    active_configs = db.query(func.count(EmailMonitorConfig.id)).filter(
+        EmailMonitorConfig.active == True).scalar_subquery()
+    counts = db.query(
+        active_webhooks,
+        active_configs,
+        func.count(ProcessedEmail.id),
+        func.sum(case((ProcessedEmail.forwarded_successfully == True, 1), else_=0)),
+        func.sum(case((ProcessedEmail.processed_at >= last_24h, 1), else_=0))
+    ).one()
+    active_webhooks_count, active_configs_count, total_emails, success_emails, emails_24h = (
+        count or 0 for count in counts)
+
+    # Get recent emails (last 5) as plain dicts rather than ORM instances
+    recent_emails = db.execute(
+        select(
+            ProcessedEmail.id,
+            ProcessedEmail.message_id,
+            ProcessedEmail.sender,
+            ProcessedEmail.subject,
+            ProcessedEmail.received_at,
+            ProcessedEmail.processed_at,
+            ProcessedEmail.forwarded_successfully,
+            ProcessedEmail.body_snippet
+        ).order_by(desc(ProcessedEmail.processed_at)).limit(5)
+    ).mappings().all()
 
     # Calculate success rate
     success_rate = 0
@@ -53,37 +84,34 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
 
 
 @router.get("/processed-emails/summary")
-async def get_processed_emails_summary(db: Session = Depends(get_db)):
+def get_processed_emails_summary(db: Session = Depends(get_db)):
     """Get summary of processed emails"""
 
-    # Total emails processed
-    total = db.query(func.count(ProcessedEmail.id)).scalar() or 0
+    # Per-day totals and successes in one GROUP BY; the overall totals are
+    # summed from the same rows instead of separate COUNT queries
+    day = func.date(ProcessedEmail.processed_at)
+    rows = db.query(
+        day,
+        func.count(ProcessedEmail.id),
+        func.sum(case((ProcessedEmail.forwarded_successfully == True, 1), else_=0))
+    ).group_by(day).all()
 
-    # Total successfully forwarded
-    success = db.query(func.count(ProcessedEmail.id)).filter(
-        ProcessedEmail.forwarded_successfully == True).scalar() or 0
+    # Total emails processed and total successfully forwarded
+    total = sum(count for _, count, _ in rows)
+    success = sum(successes or 0 for _, _, successes in rows)
 
     # Total failed
     failed = total - success
 
-    # Group by date (last 7 days)
-    last_7_days = datetime.now() - timedelta(days=7)
-
+    # Group by date (last 7 days, in UTC like processed_at), filling in days without emails
+    counts_by_day = {str(date): count for date, count, _ in rows if date is not None}
+    today = datetime.utcnow()
     daily_stats = []
     for i in range(7):
-        day = datetime.now() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59,
-                              second=59, microsecond=999999)
-
-        count = db.query(func.count(ProcessedEmail.id)).filter(
-            ProcessedEmail.processed_at >= day_start,
-            ProcessedEmail.processed_at <= day_end
-        ).scalar() or 0
-
+        date = (today - timedelta(days=i)).strftime("%Y-%m-%d")
         daily_stats.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "count": count
+            "date": date,
+            "count": counts_by_day.get(date, 0)
         })
 
     return {
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import logging
-import json
+import orjson
 from typing import Dict, List, Set
 import asyncio
 from starlette.websockets import WebSocketState
@@ -13,7 +13,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Store for active WebSocket connections
-active_connections: List[WebSocket] = []
+active_connections: Set[WebSocket] = set()
 
 
 @router.websocket("/emails")
@@ -24,44 +24,42 @@ async def websocket_endpoint(websocket: WebSocket):
 
     try:
         await websocket.accept()
-        active_connections.append(websocket)
+        active_connections.add(websocket)
         logger.info(
             f"New WebSocket client connected from {client_info}. Total active connections: {len(active_connections)}")
 
         # Send initial connection confirmation
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(orjson.dumps({
             "type": "connection_status",
             "status": "connected",
             "message": "WebSocket connection established"
-        }))
+        }).decode())
 
         while True:
             # Keep the connection alive until client disconnects
             data = await websocket.receive_text()
-            logger.info(f"Received message from client {client_info}: {data}")
+            logger.debug("Received message from client %s: %s", client_info, data)
 
             # Handle ping messages
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
                 if message.get("type") == "ping":
-                    logger.info(
-                        f"Ping received from {client_info}, sending pong")
-                    await websocket.send_text(json.dumps({
+                    logger.debug(
+                        "Ping received from %s, sending pong", client_info)
+                    await websocket.send_text(orjson.dumps({
                         "type": "pong",
                         "timestamp": "now"
-                    }))
+                    }).decode())
             except Exception as e:
                 logger.error(f"Error handling client message: {e}")
     except WebSocketDisconnect:
         # Remove the connection on disconnect
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        active_connections.discard(websocket)
         logger.info(
             f"WebSocket client {client_info} disconnected. Remaining connections: {len(active_connections)}")
     except Exception as e:
         logger.error(f"WebSocket error with client {client_info}: {e}")
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        active_connections.discard(websocket)
 
 
 # Function to broadcast a message to all connected clients
@@ -71,49 +69,53 @@ async def broadcast_email_processed(email_data: dict):
         logger.info("No WebSocket clients connected, skipping broadcast")
         return
 
-    # Convert to JSON string
-    message = json.dumps({
+    # Drop clients that are no longer connected before doing any work for them
+    connected = [
+        connection for connection in active_connections
+        if connection.client_state == WebSocketState.CONNECTED
+    ]
+    if len(connected) < len(active_connections):
+        logger.warning(
+            f"Removing {len(active_connections) - len(connected)} clients not in CONNECTED state")
+        active_connections.intersection_update(connected)
+    if not connected:
+        logger.info("No connected WebSocket clients, skipping broadcast")
+        return
+
+    # Convert to JSON string once for every client; orjson also handles datetimes
+    message = orjson.dumps({
         "type": "email_processed",
         "data": email_data
-    })
+    }).decode()
 
     logger.info(
-        f"Broadcasting email update to {len(active_connections)} clients")
+        f"Broadcasting email update to {len(connected)} clients")
     logger.info(
         f"Broadcast content summary: Subject: {email_data.get('subject', 'Unknown')}, ID: {email_data.get('id', 'Unknown')}")
 
-    # Track disconnected clients to remove them
-    disconnected = []
-
-    # Send to all connected clients
-    for i, connection in enumerate(active_connections):
-        try:
-            if connection.client_state == WebSocketState.CONNECTED:
-                await connection.send_text(message)
-                logger.info(f"Message sent to client {i+1}")
-            else:
-                logger.warning(
-                    f"Client {i+1} is not in CONNECTED state, marking for removal")
-                disconnected.append(i)
-        except WebSocketDisconnect:
+    # Send to all connected clients concurrently so one slow client doesn't hold up the rest
+    results = await asyncio.gather(
+        *(connection.send_text(message) for connection in connected),
+        return_exceptions=True)
+
+    # Track clients whose send failed to remove them
+    disconnected: Set[WebSocket] = set()
+    for i, (connection, result) in enumerate(zip(connected, results)):
+        if isinstance(result, WebSocketDisconnect):
             logger.error(
                 f"Client {i+1} disconnected during send, marking for removal")
-            disconnected.append(i)
-        except Exception as e:
+            disconnected.add(connection)
+        elif isinstance(result, BaseException):
             logger.error(
-                f"Error sending WebSocket message to client {i+1}: {e}")
-            disconnected.append(i)
+                f"Error sending WebSocket message to client {i+1}: {result}")
+            disconnected.add(connection)
+        else:
+            logger.debug("Message sent to client %d", i+1)
 
-    # Remove disconnected clients (in reverse order to avoid index issues)
+    # Remove disconnected clients
     if disconnected:
         logger.info(f"Removing {len(disconnected)} disconnected clients")
-        for i in sorted(disconnected, reverse=True):
-            try:
-                logger.info(f"Removing disconnected client at index {i}")
-                del active_connections[i]
-            except IndexError:
-                logger.warning(
-                    f"Failed to remove client at index {i}, index out of range")
+        active_connections.difference_update(disconnected)
 
     logger.info(
         f"Broadcast complete. {len(active_connections)} active connections remaining")
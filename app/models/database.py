@@ -1,14 +1,38 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import datetime
 import os
 from sqlalchemy.sql import text
-from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy import event, inspect
 
 # Create SQLite engine
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./email_forwarder.db")
-engine = create_engine(DATABASE_URL)
+if DATABASE_URL.startswith("sqlite"):
+    # Pooled connections are handed to threadpool handlers and the processor.
+    # SQLite keeps its default pool: it allows one writer anyway, and every
+    # connection carries its own page cache and mmap.
+    _engine_options = {"connect_args": {"check_same_thread": False}}
+else:
+    # Enough connections for concurrent API requests and polling without queueing;
+    # server databases can drop idle connections, so check and recycle them
+    _engine_options = {"pool_size": 20, "max_overflow": 40,
+                       "pool_pre_ping": True, "pool_recycle": 1800}
+engine = create_engine(DATABASE_URL, **_engine_options)
+
+# Let readers (API requests) proceed while the email processor writes
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -54,6 +78,13 @@ class ProcessedEmail(Base):
     forwarded_successfully = Column(Boolean, default=False)
     body_snippet = Column(Text, nullable=True)
 
+    __table_args__ = (
+        # Pagination orders by processed_at and the stats filter on it and forwarded_successfully
+        Index('ix_processed_emails_pat_fwd', 'processed_at', 'forwarded_successfully'),
+        # The summary groups by day
+        Index('ix_processed_emails_processed_at_date', text("date(processed_at)")),
+    )
+
 
 # Database dependency
 def get_db():
@@ -83,8 +114,63 @@ def initialize_db():
             conn.execute(text("ALTER TABLE webhook_configs ADD COLUMN send_raw_body BOOLEAN DEFAULT 0"))
             print("Added send_raw_body column to webhook_configs table")
             
+        # create_all() skips existing tables, so add indexes introduced since
+        for index in ProcessedEmail.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+            
         conn.commit()
         conn.close()
     except Exception as e:
         print(f"Error updating schema: {e}")
         # Continue even if the schema update fails
+
+    if engine.dialect.name == "sqlite":
+        _create_processed_emails_fts()
+
+
+# Full-text index over the searchable processed email columns (SQLite only).
+# The trigram tokenizer keeps substring semantics for terms of 3+ characters.
+_processed_emails_fts = False
+
+_PROCESSED_EMAILS_FTS_DDL = [
+    """CREATE VIRTUAL TABLE processed_emails_fts USING fts5(
+        subject, sender, body_snippet,
+        content='processed_emails', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS processed_emails_fts_ai AFTER INSERT ON processed_emails BEGIN
+        INSERT INTO processed_emails_fts(rowid, subject, sender, body_snippet)
+        VALUES (new.id, new.subject, new.sender, new.body_snippet);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS processed_emails_fts_ad AFTER DELETE ON processed_emails BEGIN
+        INSERT INTO processed_emails_fts(processed_emails_fts, rowid, subject, sender, body_snippet)
+        VALUES ('delete', old.id, old.subject, old.sender, old.body_snippet);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS processed_emails_fts_au AFTER UPDATE ON processed_emails BEGIN
+        INSERT INTO processed_emails_fts(processed_emails_fts, rowid, subject, sender, body_snippet)
+        VALUES ('delete', old.id, old.subject, old.sender, old.body_snippet);
+        INSERT INTO processed_emails_fts(rowid, subject, sender, body_snippet)
+        VALUES (new.id, new.subject, new.sender, new.body_snippet);
+    END""",
+    # Index the rows that existed before the table was created
+    "INSERT INTO processed_emails_fts(processed_emails_fts) VALUES ('rebuild')",
+]
+
+
+def _create_processed_emails_fts():
+    global _processed_emails_fts
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'processed_emails_fts'")).first()
+            if not exists:
+                for statement in _PROCESSED_EMAILS_FTS_DDL:
+                    conn.execute(text(statement))
+                print("Created processed_emails_fts search index")
+        _processed_emails_fts = True
+    except Exception as e:
+        # Older SQLite builds lack FTS5 or the trigram tokenizer; search falls back to LIKE
+        print(f"Full-text search unavailable: {e}")
+
+
+def processed_emails_fts_enabled() -> bool:
+    """Whether processed email search can use the processed_emails_fts index"""
+    return _processed_emails_fts
@@ -1,46 +1,76 @@
 import os
 import base64
+import functools
 import json
 import logging
+import tempfile
 from google.oauth2.credentials import Credentials
 
 logger = logging.getLogger(__name__)
 
+# The app directory, holding credentials.json and the fallback token.json
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# credentials.json in the app directory, used when the env variable is not set
+CREDENTIALS_FILE_PATH = os.path.join(APP_DIR, "credentials.json")
+
+# Fields a saved token needs to be refreshed later
+REQUIRED_TOKEN_FIELDS = ('refresh_token', 'token_uri', 'client_id', 'client_secret')
+
+# Last parsed credentials as ((env value, file mtime/size), data)
+_credentials_cache = None
+
 def get_google_credentials_data():
     """
     Loads Google API credentials from either:
     1. GOOGLE_CREDENTIALS_BASE64 environment variable (recommended for production)
     2. credentials.json file (fallback)
     
+    The parsed result is reused until the environment variable or the
+    credentials file changes.
+    
     Returns:
         dict: The credentials data as a dictionary
         None: If credentials couldn't be loaded
     """
-    # Check if credentials are available as base64 in environment variable
+    global _credentials_cache
+    
     credentials_base64 = os.environ.get('GOOGLE_CREDENTIALS_BASE64')
+    try:
+        stat = os.stat(CREDENTIALS_FILE_PATH)
+        file_signature = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        file_signature = None
     
+    signature = (credentials_base64, file_signature)
+    if _credentials_cache is not None and _credentials_cache[0] == signature:
+        return _credentials_cache[1]
+    
+    credentials_data = _load_google_credentials_data(credentials_base64)
+    _credentials_cache = (signature, credentials_data)
+    return credentials_data
+
+def _load_google_credentials_data(credentials_base64):
+    """Parse the credentials from the env variable value or the credentials file"""
+    # Check if credentials are available as base64 in environment variable
     if credentials_base64:
         try:
-            # Decode base64 string to JSON
+            # Decode base64 string to JSON; json.loads takes the UTF-8 bytes directly
             logger.info("Loading credentials from environment variable")
-            credentials_json = base64.b64decode(credentials_base64).decode('utf-8')
-            return json.loads(credentials_json)
+            return json.loads(base64.b64decode(credentials_base64))
         except Exception as e:
             logger.error(f"Failed to load credentials from environment variable: {e}")
-            print(f"ERROR: Failed to load credentials from environment variable: {e}")
             # Don't return yet, try the file method as fallback
     
     # Fallback to file-based credentials
     try:
         # Check for credentials.json
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        app_dir = os.path.dirname(script_dir)  # Go up one level to app directory
-        credentials_path = os.path.join(app_dir, "credentials.json")
+        credentials_path = CREDENTIALS_FILE_PATH
         
         logger.info(f"Looking for credentials file at: {credentials_path}")
         
         if os.path.exists(credentials_path):
-            with open(credentials_path, 'r') as f:
+            with open(credentials_path, 'rb') as f:
                 return json.load(f)
         else:
             logger.warning(f"Credentials file not found at: {credentials_path}")
@@ -49,6 +79,53 @@ def get_google_credentials_data():
         logger.error(f"Error reading credentials: {e}")
         return None
 
+@functools.lru_cache(maxsize=16)
+def decode_id_token_payload(id_token):
+    """
+    Decode the claims of a JWT id_token without verifying its signature.
+    
+    Args:
+        id_token: The encoded id_token string
+        
+    Returns:
+        dict: The token claims; shared between calls, so don't modify it
+        
+    Raises:
+        ValueError: If the payload is not base64url-encoded JSON
+    """
+    # header.payload.signature - take the middle segment without building a list
+    payload = id_token.partition('.')[2].partition('.')[0]
+    # JWT segments are unpadded base64url
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+
+def _write_file_atomic(path, data):
+    """
+    Write bytes to a file so readers see either the old or the new contents.
+    
+    The data goes to an owner-only temp file next to the target, is flushed to
+    disk, and then replaces the target.
+    
+    Args:
+        path: Path of the file to write
+        data: The complete file contents
+    """
+    # A unique temp name so concurrent writers (one per worker) never share a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        # mkstemp creates the file owner-only (0600); fdopen's write loops over short writes
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 def save_credentials_to_token_file(credentials, token_path):
     """
     Save credentials to token file.
@@ -58,47 +135,46 @@ def save_credentials_to_token_file(credentials, token_path):
         token_path: Path to save token file
     """
     try:
-        print(f"Starting to save credentials to token file: {token_path}")
+        logger.debug("Starting to save credentials to token file: %s", token_path)
         
         # Check if path is empty or None
         if not token_path or token_path.strip() == '':
             # Use a fallback path in case token_path is empty
-            print("ERROR: Token path is empty! Using fallback path.")
-            import os
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            app_dir = os.path.dirname(script_dir)  # app directory
-            token_path = os.path.join(app_dir, "token.json")
-            print(f"Using fallback token path: {token_path}")
+            logger.error("Token path is empty! Using fallback path.")
+            token_path = os.path.join(APP_DIR, "token.json")
+            logger.debug("Using fallback token path: %s", token_path)
         
         # Ensure directory exists
         token_dir = os.path.dirname(token_path)
-        print(f"Token directory path: '{token_dir}'")
+        logger.debug("Token directory path: '%s'", token_dir)
         
         # Check if token_dir is empty
         if not token_dir or token_dir.strip() == '':
-            print("WARNING: Token directory is empty, using current directory")
+            logger.warning("Token directory is empty, using current directory")
             token_dir = os.path.dirname(os.path.abspath(__file__))
             token_path = os.path.join(token_dir, "token.json")
-            print(f"Using directory {token_dir} and updated token_path to {token_path}")
+            logger.debug("Using directory %s and updated token_path to %s", token_dir, token_path)
             
         try:
-            print(f"Creating directory {token_dir}")
+            logger.debug("Creating directory %s", token_dir)
             os.makedirs(token_dir, exist_ok=True)
-            print(f"Directory created successfully: {os.path.exists(token_dir)}")
-            print(f"Directory writable: {os.access(token_dir, os.W_OK)}")
+            # These probes cost syscalls, so only run them when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Directory created successfully: %s", os.path.exists(token_dir))
+                logger.debug("Directory writable: %s", os.access(token_dir, os.W_OK))
         except Exception as dir_error:
-            print(f"ERROR creating directory {token_dir}: {dir_error}")
+            logger.error(f"Error creating directory {token_dir}: {dir_error}")
             # If we can't create the directory, try using the current directory
-            import os
             current_dir = os.getcwd()
-            print(f"Falling back to current directory: {current_dir}")
+            logger.info("Falling back to current directory: %s", current_dir)
             token_path = os.path.join(current_dir, "token.json")
-            print(f"New token path: {token_path}")
+            logger.debug("New token path: %s", token_path)
         
-        # Debug information
-        print(f"Saving credentials to token path: {token_path}")
-        print(f"Token path directory exists: {os.path.exists(os.path.dirname(token_path))}")
-        print(f"Credential attributes: {dir(credentials)}")
+        # Debug information; dir() and the stat are skipped unless debug logging is on
+        logger.debug("Saving credentials to token path: %s", token_path)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Token path directory exists: %s", os.path.exists(os.path.dirname(token_path)))
+            logger.debug("Credential attributes: %s", dir(credentials))
         
         # Create a dictionary with all required fields for token refresh
         token_data = {
@@ -120,73 +196,40 @@ def save_credentials_to_token_file(credentials, token_path):
         # Add email from payload if available
         if hasattr(credentials, 'id_token') and credentials.id_token:
             try:
-                jwt_segments = credentials.id_token.split('.')
-                if len(jwt_segments) >= 2:
-                    payload = jwt_segments[1]
-                    # Add padding if needed
-                    payload += '=' * (4 - len(payload) % 4) if len(payload) % 4 else ''
-                    # Decode base64
-                    decoded = base64.b64decode(payload).decode('utf-8')
-                    token_data_jwt = json.loads(decoded)
-                    if 'email' in token_data_jwt:
-                        token_data['email'] = token_data_jwt['email']
-                        print(f"Extracted email from token: {token_data_jwt['email']}")
+                email = decode_id_token_payload(credentials.id_token).get('email')
+                if email is not None:
+                    token_data['email'] = email
+                    logger.debug("Extracted email from token: %s", email)
             except Exception as e:
-                print(f"Error extracting email from id_token: {e}")
                 logger.error(f"Error extracting email from id_token: {e}")
         
-        # Write the token data to file
-        token_json = json.dumps(token_data)
-        print(f"Writing token data (length: {len(token_json)}) to {token_path}")
+        # Serialize once and replace the token file in a single write
+        token_bytes = json.dumps(token_data, separators=(',', ':')).encode('utf-8')
+        logger.debug("Writing token data (length: %d) to %s", len(token_bytes), token_path)
         
         try:
-            with open(token_path, 'w') as f:
-                print(f"File opened for writing: {token_path}")
-                json.dump(token_data, f)
-                print(f"Data written to file: {token_path}")
-        except Exception as write_error:
-            print(f"ERROR writing token file: {write_error}")
+            _write_file_atomic(token_path, token_bytes)
+            logger.debug("Data written to file: %s", token_path)
+        except OSError as write_error:
             logger.error(f"Error writing token file: {write_error}")
+            return False
             
-            # Try one more time with a different approach
-            try:
-                print("Trying alternative approach to write file")
-                with open(token_path, 'w', encoding='utf-8') as f:
-                    f.write(token_json)
-                print("Alternative write approach succeeded")
-            except Exception as alt_write_error:
-                print(f"Alternative write approach also failed: {alt_write_error}")
-                return False
-            
-        # Verify the token file was created with all required fields
-        if not os.path.exists(token_path):
-            print(f"ERROR: Failed to create token file at {token_path}")
-            logger.error(f"Failed to create token file at {token_path}")
+        # Verify the token has all required fields; the file holds exactly token_data,
+        # so check the dict instead of reading the file back
+        missing_fields = [
+            required_field
+            for required_field in REQUIRED_TOKEN_FIELDS
+            if not token_data.get(required_field)
+        ]
+        if missing_fields:
+            logger.error(f"Token file is missing required fields: {', '.join(missing_fields)}")
             return False
         
-        # Verify token contains all required fields
-        try:
-            with open(token_path, 'r') as f:
-                saved_token = json.load(f)
-                missing_fields = []
-                for required_field in ['refresh_token', 'token_uri', 'client_id', 'client_secret']:
-                    if required_field not in saved_token or not saved_token[required_field]:
-                        missing_fields.append(required_field)
-                
-                if missing_fields:
-                    print(f"WARNING: Token file is missing required fields: {', '.join(missing_fields)}")
-                    logger.error(f"Token file is missing required fields: {', '.join(missing_fields)}")
-                    return False
-                
-                print(f"Successfully verified token file has all required fields")
-        except Exception as verify_error:
-            print(f"ERROR verifying token file: {verify_error}")
-            # If we can't verify, still consider it a success if the file exists
+        logger.debug("Successfully verified token file has all required fields")
             
         return True
     except Exception as e:
-        print(f"ERROR: Failed to save credentials to token file: {e}")
         logger.error(f"Error saving credentials to token file: {e}")
-        import traceback
-        print(traceback.format_exc())
+        # The traceback is only formatted when debug logging is on
+        logger.debug("Traceback for the failed token save", exc_info=True)
         return False 
\ No newline at end of file
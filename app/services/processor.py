@@ -4,12 +4,13 @@ import base64
 import json
 import logging
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 from typing import Dict, List, Optional, Set
 from sqlalchemy.orm import Session
 import aiohttp
+from fastapi.concurrency import run_in_threadpool
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
 from app.models.database import EmailMonitorConfig, WebhookConfig, ProcessedEmail
@@ -26,6 +27,18 @@ logger = logging.getLogger(__name__)
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'  # Allow HTTP for localhost
 os.environ['OAUTHLIB_RELAX_TOKEN_SCOPE'] = '1'   # Allow scope downgrade
 
+# Messages fetched per Gmail batch request (the API allows 100, fewer is less likely to be throttled)
+GMAIL_BATCH_SIZE = 50
+
+# Connection pool for the shared webhook session
+WEBHOOK_CONNECTION_LIMIT = 100
+WEBHOOK_CONNECTIONS_PER_HOST = 64
+WEBHOOK_KEEPALIVE_TIMEOUT = 75
+WEBHOOK_DNS_CACHE_TTL = 300
+
+# Messages processed (forwarded, saved and broadcast) at the same time
+MAX_CONCURRENT_MESSAGES = 16
+
 
 class EmailProcessor:
     def __init__(self):
@@ -33,9 +46,11 @@ class EmailProcessor:
         self._tasks = set()
         self._processed_ids: Set[str] = set()
         self._lock = asyncio.Lock()
+        self._message_semaphore = asyncio.Semaphore(MAX_CONCURRENT_MESSAGES)
         self.credentials_path = CREDENTIALS_PATH
         self.token_path = TOKEN_PATH
         self._gmail_service = None
+        self._http_session: Optional[aiohttp.ClientSession] = None
         
     async def initialize_gmail_service(self):
         """Initialize the Gmail API service."""
@@ -67,9 +82,11 @@ class EmailProcessor:
                     if credentials and credentials.expired and credentials.refresh_token:
                         logger.info("Refreshing expired credentials")
                         try:
-                            credentials.refresh(Request())
+                            # Refreshing is a blocking HTTPS call, keep it off the event loop
+                            await run_in_threadpool(credentials.refresh, Request())
                             # Save the refreshed credentials
-                            save_credentials_to_token_file(credentials, self.token_path)
+                            await run_in_threadpool(
+                                save_credentials_to_token_file, credentials, self.token_path)
                         except Exception as refresh_error:
                             logger.error(f"Error refreshing credentials: {refresh_error}")
                             # Try the OAuth flow as a fallback
@@ -128,6 +145,13 @@ class EmailProcessor:
         logger.info("Starting email monitor tasks")
         self._running = True
 
+        # One session for the lifetime of monitoring so webhook connections are reused
+        self._http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=WEBHOOK_CONNECTION_LIMIT,
+            limit_per_host=WEBHOOK_CONNECTIONS_PER_HOST,
+            keepalive_timeout=WEBHOOK_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=WEBHOOK_DNS_CACHE_TTL))
+
         # Start the monitor task
         monitor_task = asyncio.create_task(self._email_monitor_loop(db))
         self._tasks.add(monitor_task)
@@ -135,12 +159,16 @@ class EmailProcessor:
         
         return monitor_task
 
-    def stop_monitoring(self):
+    async def stop_monitoring(self):
         """Stop all monitoring tasks."""
         self._running = False
         for task in self._tasks:
             task.cancel()
 
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+
     async def _email_monitor_loop(self, db: Session):
         """Main loop for checking emails periodically."""
         while self._running:
@@ -170,11 +198,30 @@ class EmailProcessor:
 
         try:
             query = self._build_gmail_query(config)
-            results = self._gmail_service.users().messages().list(userId='me', q=query).execute()
+            results = await run_in_threadpool(
+                self._gmail_service.users().messages().list(userId='me', q=query).execute)
             messages = results.get('messages', [])
 
-            for message in messages:
-                await self._process_email_message(message, db)
+            # Skip messages already handled, checking memory first and then the database in one query
+            new_ids = [message['id'] for message in messages
+                       if message['id'] not in self._processed_ids]
+            if new_ids:
+                known_ids = {row.message_id for row in db.query(ProcessedEmail.message_id).filter(
+                    ProcessedEmail.message_id.in_(new_ids))}
+                self._processed_ids.update(known_ids)
+                new_ids = [message_id for message_id in new_ids if message_id not in known_ids]
+
+            # Fetch the new messages in batches rather than one request each,
+            # then process each batch concurrently (bounded by the semaphore)
+            for start in range(0, len(new_ids), GMAIL_BATCH_SIZE):
+                msgs = await self._fetch_messages(new_ids[start:start + GMAIL_BATCH_SIZE])
+                webhooks = self._get_active_webhooks(db)
+                results = await asyncio.gather(
+                    *[self._process_email_message(msg, webhooks, db) for msg in msgs],
+                    return_exceptions=True)
+                for msg, result in zip(msgs, results):
+                    if isinstance(result, BaseException):
+                        logger.error(f"Error processing email {msg['id']}: {result}")
 
         except Exception as e:
             logger.error(f"Error checking emails: {e}")
@@ -193,26 +240,40 @@ class EmailProcessor:
 
         return query
 
-    async def _process_email_message(self, message, db: Session):
-        """Process a single email message."""
-        message_id = message['id']
+    async def _fetch_messages(self, message_ids: List[str]) -> List[dict]:
+        """Fetch full messages in a single batched Gmail request."""
+        fetched = {}
+
+        def on_message(request_id, response, exception):
+            if exception is not None:
+                # Left unprocessed, so the next check retries it
+                logger.error(f"Error fetching email {request_id}: {exception}")
+            else:
+                fetched[request_id] = response
+
+        batch = self._gmail_service.new_batch_http_request(callback=on_message)
+        for message_id in message_ids:
+            batch.add(self._gmail_service.users().messages().get(
+                userId='me', id=message_id), request_id=message_id)
+        await run_in_threadpool(batch.execute)
+
+        # Keep the order Gmail listed them in
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+    async def _process_email_message(self, msg, webhooks, db: Session):
+        """Process a single fetched email message."""
+        async with self._message_semaphore:
+            await self._handle_email_message(msg, webhooks, db)
+
+    async def _handle_email_message(self, msg, webhooks, db: Session):
+        """Forward, record and broadcast a fetched email message."""
+        message_id = msg['id']
 
         # Check if we've already processed this message
         async with self._lock:
             if message_id in self._processed_ids:
                 return
 
-        # Check database for already processed
-        existing = db.query(ProcessedEmail).filter(
-            ProcessedEmail.message_id == message_id).first()
-        if existing:
-            self._processed_ids.add(message_id)
-            return
-
-        # Get the message content
-        msg = self._gmail_service.users().messages().get(
-            userId='me', id=message_id).execute()
-
         # Extract email data
         email_data = self._extract_email_data(msg)
         if not email_data.get('body'):
@@ -224,7 +285,7 @@ class EmailProcessor:
             email_data['body'],
             email_data['subject'],
             email_data['sender'],
-            db
+            webhooks
         )
 
         # Record this email as processed
@@ -249,7 +310,6 @@ class EmailProcessor:
         date_str = headers.get('Date', '')
         received_at = datetime.now()
         try:
-            from email.utils import parsedate_to_datetime
             received_at = parsedate_to_datetime(date_str)
         except:
             pass
@@ -272,7 +332,12 @@ class EmailProcessor:
             body_snippet=email_data['body'][:500] if email_data['body'] else None
         )
         db.add(processed)
-        db.commit()
+        try:
+            db.commit()
+        except Exception:
+            # Don't leave the shared session unusable for the other messages in the batch
+            db.rollback()
+            raise
         db.refresh(processed)
         return processed
 
@@ -296,7 +361,7 @@ class EmailProcessor:
                 broadcast_email_processed(email_dict))
             broadcast_task.add_done_callback(
                 lambda _: asyncio.create_task(
-                    self._log_broadcast_completion(broadcast_task, processed.subject))
+                    self._log_broadcast_completion(broadcast_task, email_dict["subject"]))
             )
 
         except Exception as e:
@@ -330,11 +395,17 @@ class EmailProcessor:
 
         return None
 
-    async def _forward_to_webhooks(self, body: str, subject: str, sender: str, db: Session) -> bool:
-        """Forward the email content to all active webhooks."""
-        webhooks = db.query(WebhookConfig).filter(
-            WebhookConfig.active == True).all()
-
+    def _get_active_webhooks(self, db: Session):
+        """Load the active webhooks as plain rows, which another message's commit cannot expire."""
+        return db.query(
+            WebhookConfig.name,
+            WebhookConfig.url,
+            WebhookConfig.content_type,
+            WebhookConfig.send_raw_body
+        ).filter(WebhookConfig.active == True).all()
+
+    async def _forward_to_webhooks(self, body: str, subject: str, sender: str, webhooks) -> bool:
+        """Forward the email content to the given webhooks."""
         if not webhooks:
             logger.warning("No active webhooks configured")
             return False
@@ -346,17 +417,16 @@ class EmailProcessor:
             "timestamp": datetime.now().isoformat()
         }
 
-        success = False
+        # Post to every webhook concurrently; forwarding succeeds if any of them accepted it
+        results = await asyncio.gather(
+            *[self._send_to_webhook(self._http_session, webhook, body, payload) for webhook in webhooks],
+            return_exceptions=True)
 
-        async with aiohttp.ClientSession() as session:
-            for webhook in webhooks:
-                try:
-                    success = await self._send_to_webhook(session, webhook, body, payload)
-                except Exception as e:
-                    logger.error(
-                        f"Error sending to webhook {webhook.name}: {e}")
+        for webhook, result in zip(webhooks, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error sending to webhook {webhook.name}: {result}")
 
-        return success
+        return any(result is True for result in results)
 
     async def _send_to_webhook(self, session, webhook, body, payload):
         """Send data to a single webhook."""
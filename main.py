@@ -4,13 +4,13 @@ import sys
 import platform
 from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, FileResponse, JSONResponse
+from fastapi.responses import RedirectResponse, FileResponse, JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-import json
+import orjson
 import datetime
 import secrets
 
@@ -18,6 +18,7 @@ from app.api.endpoints import router as api_router
 from app.models.database import get_db, initialize_db
 from app.services.processor import EmailProcessor
 from app.api.endpoints.websocket import active_connections
+from app.api.endpoints.auth import refresh_auth_state_loop
 
 load_dotenv()
 
@@ -41,10 +42,14 @@ async def lifespan(app: FastAPI):
             "WARNING: Email processor failed to start. Gmail monitoring will not be active.")
         print("Please check your Gmail API credentials and permissions.")
 
+    # Keep the auth status current so /api/v1/auth/status never touches disk
+    auth_state_task = asyncio.create_task(refresh_auth_state_loop())
+
     yield
 
-    # Stop the background task
-    email_processor.stop_monitoring()
+    # Stop the background tasks
+    auth_state_task.cancel()
+    await email_processor.stop_monitoring()
     try:
         db_generator.close()
     except:
@@ -71,7 +76,8 @@ app = FastAPI(
     """,
     version="1.0.0",
     lifespan=lifespan,
-    redirect_slashes=True
+    redirect_slashes=True,
+    default_response_class=ORJSONResponse
 )
 
 # Define allowed origins for CORS
@@ -225,20 +231,20 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
 
     # Send welcome message
-    await websocket.send_text(json.dumps({
+    await websocket.send_text(orjson.dumps({
         "type": "connection_status",
         "status": "connected",
         "message": "WebSocket connection established"
-    }))
+    }).decode())
 
     try:
         while True:
             data = await websocket.receive_text()
             # Echo back the message
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(orjson.dumps({
                 "type": "echo",
                 "data": data
-            }))
+            }).decode())
     except WebSocketDisconnect:
         pass
 